@@ -9,17 +9,24 @@ from pathlib import Path
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
+import yaml
 
+import tracing
+from distance import condition_distances
 from utils import (
     bitwise_compare,
     compare_outputs,
+    compare_to_golden,
+    iter_runs,
     load_config,
     load_runs,
     setup_logging,
+    update_index,
 )
 
 BASELINE_DIR = Path(__file__).parent.parent / "data" / "baseline"
 RUNS_DIR = Path(__file__).parent.parent / "data" / "runs"
+SWEEP_DIR = Path(__file__).parent.parent / "data" / "sweep"
 PLOTS_DIR = Path(__file__).parent.parent / "data" / "plots"
 RESULTS_PATH = Path(__file__).parent.parent / "docs" / "RESULTS.md"
 
@@ -40,9 +47,30 @@ def group_by_condition(runs):
     return dict(grouped)
 
 
-def analyze_baseline(log):
+def baseline_filters(filters):
+    """Adapt run filters for baseline data, or None if baseline is filtered out.
+
+    Baseline records carry no condition field; they form the "baseline" condition.
+    """
+    condition = filters.get("condition")
+    if condition is not None and condition != "baseline":
+        return None
+    return {k: v for k, v in filters.items() if k != "condition"}
+
+
+def experiment_filters(filters):
+    """Adapt run filters for experiment data, or None if experiments are filtered out."""
+    if filters.get("condition") == "baseline":
+        return None
+    return filters
+
+
+def analyze_baseline(log, filters):
     """Analyze baseline runs and return results."""
-    runs = load_runs(BASELINE_DIR)
+    filters = baseline_filters(filters)
+    if filters is None:
+        return None
+    runs = load_runs(BASELINE_DIR, **filters)
     if not runs:
         log.warning("No baseline data found in %s", BASELINE_DIR)
         return None
@@ -53,6 +81,7 @@ def analyze_baseline(log):
 
     for prompt_id, prompt_runs in sorted(by_prompt.items()):
         stats = compare_outputs(prompt_runs)
+        stats["golden"] = compare_to_golden(prompt_runs)
         results[prompt_id] = stats
         log.info(
             "  Prompt '%s': %d/%d identical",
@@ -62,9 +91,12 @@ def analyze_baseline(log):
     return results
 
 
-def analyze_experiment(log):
+def analyze_experiment(log, filters):
     """Analyze experiment runs and return results grouped by condition and prompt."""
-    runs = load_runs(RUNS_DIR)
+    filters = experiment_filters(filters)
+    if filters is None:
+        return None
+    runs = load_runs(RUNS_DIR, **filters)
     if not runs:
         log.warning("No experiment data found in %s", RUNS_DIR)
         return None
@@ -78,6 +110,7 @@ def analyze_experiment(log):
         results[condition] = {}
         for prompt_id, prompt_runs in sorted(by_prompt.items()):
             stats = compare_outputs(prompt_runs)
+            stats["golden"] = compare_to_golden(prompt_runs)
             results[condition][prompt_id] = stats
             log.info(
                 "  %s / %s: %d/%d identical",
@@ -87,6 +120,119 @@ def analyze_experiment(log):
     return results
 
 
+def sweep_point(run):
+    """Return the swept inference parameters of a run."""
+    return {
+        "seed": run["seed"],
+        "temperature": run["temperature"],
+        "n_gpu_layers": run["params"]["n_gpu_layers"],
+        "max_tokens": run["params"]["max_tokens"],
+    }
+
+
+def parse_where(clauses):
+    """Parse ["temperature=0.8", ...] into {"temperature": 0.8, ...}."""
+    where = {}
+    for clause in clauses:
+        key, sep, value = clause.partition("=")
+        if not sep:
+            raise ValueError(f"Expected key=value, got '{clause}'")
+        where[key.strip()] = yaml.safe_load(value)
+    return where
+
+
+def analyze_sweep(log, filters, where):
+    """Analyze sweep runs grouped by parameter point (params_hash).
+
+    Baseline runs share params_hash with sweep points, and sweep.py counts
+    them as already run, so they are included too. Early-stopped runs are not.
+    """
+    sources = [
+        (SWEEP_DIR, experiment_filters(filters)),
+        (BASELINE_DIR, baseline_filters(filters)),
+    ]
+    groups = defaultdict(list)
+    for directory, dir_filters in sources:
+        if dir_filters is None:
+            continue
+        for run in iter_runs(directory, **dir_filters):
+            if not run.get("params_hash") or run.get("early_stop", {}).get("stopped_early"):
+                continue
+            point = sweep_point(run)
+            if all(point.get(k) == v for k, v in where.items()):
+                groups[run["params_hash"]].append(run)
+
+    if not groups:
+        log.warning("No sweep data found in %s matching the filters", SWEEP_DIR)
+        return None
+
+    results = []
+    for key, runs in groups.items():
+        runs.sort(key=lambda r: (r["timestamp"], r["run_index"]))
+        results.append({
+            "params_hash": key,
+            "prompt_id": runs[0]["prompt_id"],
+            "point": sweep_point(runs[0]),
+            "stats": compare_outputs(runs),
+        })
+    results.sort(key=lambda r: (r["prompt_id"], sorted(r["point"].items())))
+    log.info("Loaded %d sweep points", len(results))
+    return results
+
+
+def print_sweep_summary(sweep_results):
+    """Print identical rate and divergence per sweep parameter point."""
+    print("\n" + "=" * 60)
+    print("SWEEP SUMMARY")
+    print("=" * 60)
+    for r in sweep_results:
+        stats = r["stats"]
+        total = stats["total"]
+        identical = stats["identical"]
+        pct = identical / total * 100 if total > 0 else 0
+        point = ", ".join(f"{k}={v}" for k, v in r["point"].items())
+        line = f"  {r['prompt_id']} [{point}]: {identical}/{total} identical ({pct:.1f}%)"
+        if stats["divergent"]:
+            tokens = [d["first_divergence_token"] for d in stats["divergent"]]
+            line += f", first divergence min={min(tokens)}"
+        print(line)
+    print("\n" + "=" * 60)
+
+
+@tracing.traced
+def analyze_distances(log, filters, workers=None, max_dist=None):
+    """Compute condition-vs-condition token edit distances for each prompt.
+
+    Early-stopped runs are excluded: their outputs end shortly after the first
+    divergence, so the missing tail would count as edit distance. Returns
+    (results, n_excluded).
+    """
+    sources = [
+        (BASELINE_DIR, baseline_filters(filters)),
+        (RUNS_DIR, experiment_filters(filters)),
+    ]
+    by_prompt = defaultdict(lambda: defaultdict(list))
+    excluded = 0
+    for directory, dir_filters in sources:
+        if dir_filters is None:
+            continue
+        for run in iter_runs(directory, **dir_filters):
+            if run.get("early_stop", {}).get("stopped_early"):
+                excluded += 1
+                continue
+            by_prompt[run["prompt_id"]][run.get("condition", "baseline")].append(run["output"])
+
+    results = {}
+    for prompt_id, by_condition in sorted(by_prompt.items()):
+        results[prompt_id] = condition_distances(by_condition, workers, max_dist)
+        log.info("  Distances for prompt '%s' across %d conditions", prompt_id, len(by_condition))
+    if excluded:
+        log.warning("Excluded %d early-stopped runs from edit distances", excluded)
+
+    return results, excluded
+
+
+@tracing.traced
 def plot_identical_rates(baseline_results, experiment_results):
     """Bar chart: identical output rate by condition for each prompt."""
     os.makedirs(PLOTS_DIR, exist_ok=True)
@@ -137,6 +283,7 @@ def plot_identical_rates(baseline_results, experiment_results):
         plt.close()
 
 
+@tracing.traced
 def plot_divergence_distribution(baseline_results, experiment_results):
     """Histogram: divergence point distribution by condition."""
     os.makedirs(PLOTS_DIR, exist_ok=True)
@@ -170,7 +317,45 @@ def plot_divergence_distribution(baseline_results, experiment_results):
     plt.close()
 
 
-def write_results(baseline_results, experiment_results):
+@tracing.traced
+def plot_distance_heatmaps(distance_results):
+    """Heatmap: mean token edit distance between conditions for each prompt."""
+    os.makedirs(PLOTS_DIR, exist_ok=True)
+
+    for prompt_id, summary in distance_results.items():
+        conditions = sorted({a for a, _ in summary})
+        matrix = [[summary[(a, b)]["mean"] for b in conditions] for a in conditions]
+
+        fig, ax = plt.subplots(figsize=(7, 6))
+        im = ax.imshow(matrix, cmap="viridis")
+        ax.set_xticks(range(len(conditions)))
+        ax.set_yticks(range(len(conditions)))
+        ax.set_xticklabels(conditions, rotation=45, ha="right")
+        ax.set_yticklabels(conditions)
+        for i, row in enumerate(matrix):
+            for j, v in enumerate(row):
+                ax.text(j, i, f"{v:.1f}", ha="center", va="center", color="w", fontsize=9)
+        fig.colorbar(im, ax=ax, label="Mean Token Edit Distance")
+        ax.set_title(f"Token Edit Distance Between Conditions — Prompt: {prompt_id}")
+        plt.tight_layout()
+        plt.savefig(PLOTS_DIR / f"edit_distance_{prompt_id}.png", dpi=150)
+        plt.close()
+
+
+def golden_summary(golden):
+    """Describe early-stop runs against the golden reference, one item per line."""
+    lines = [f"Matched golden reference: {golden['identical']}/{golden['total']} early-stop runs"]
+    if golden["divergent"]:
+        tokens = [d["first_divergence_token"] for d in golden["divergent"]]
+        lines.append(
+            f"Divergence from golden token: min={min(tokens)}, max={max(tokens)}, "
+            f"mean={sum(tokens)/len(tokens):.1f}"
+        )
+    return lines
+
+
+@tracing.traced
+def write_results(baseline_results, experiment_results, distance_results=None, distance_excluded=0):
     """Write analysis results to docs/RESULTS.md."""
     lines = ["# Results\n"]
 
@@ -188,6 +373,8 @@ def write_results(baseline_results, experiment_results):
                 tokens = [d["first_divergence_token"] for d in stats["divergent"]]
                 lines.append(f"- Divergent runs: {len(stats['divergent'])}")
                 lines.append(f"- First divergence token: min={min(tokens)}, max={max(tokens)}, mean={sum(tokens)/len(tokens):.1f}")
+            if stats.get("golden"):
+                lines.extend(f"- {line}" for line in golden_summary(stats["golden"]))
             lines.append("")
     else:
         lines.append("Not yet run.\n")
@@ -208,6 +395,8 @@ def write_results(baseline_results, experiment_results):
                     tokens = [d["first_divergence_token"] for d in stats["divergent"]]
                     lines.append(f"- Divergent runs: {len(stats['divergent'])}")
                     lines.append(f"- First divergence token: min={min(tokens)}, max={max(tokens)}, mean={sum(tokens)/len(tokens):.1f}")
+                if stats.get("golden"):
+                    lines.extend(f"- {line}" for line in golden_summary(stats["golden"]))
                 lines.append("")
     else:
         lines.append("Not yet run.\n")
@@ -217,8 +406,18 @@ def write_results(baseline_results, experiment_results):
     if baseline_results and experiment_results:
         lines.append("See plots in `data/plots/` for visualizations.\n")
         lines.append("Statistical comparison between conditions requires manual review of the generated plots and the summary data above.\n")
-    else:
+    elif not distance_results:
         lines.append("Not yet run.\n")
+    if distance_results:
+        lines.append("### Token Edit Distance Between Conditions\n")
+        if distance_excluded:
+            lines.append(f"Excluded {distance_excluded} early-stopped runs (truncated outputs).\n")
+        for prompt_id, summary in sorted(distance_results.items()):
+            lines.append(f"**Prompt: {prompt_id}**")
+            for (a, b), d in sorted(summary.items()):
+                if a <= b:
+                    lines.append(f"- {a} vs {b}: mean={d['mean']:.1f}, max={d['max']} ({d['pairs']} pairs)")
+            lines.append("")
 
     # Conclusions
     lines.append("## Conclusions\n")
@@ -241,6 +440,9 @@ def print_summary(baseline_results, experiment_results):
             identical = stats["identical"]
             pct = identical / total * 100 if total > 0 else 0
             print(f"  {prompt_id}: {identical}/{total} identical ({pct:.1f}%)")
+            if stats.get("golden"):
+                for line in golden_summary(stats["golden"]):
+                    print(f"    {line}")
     else:
         print("\nBASELINE: No data")
 
@@ -253,33 +455,124 @@ def print_summary(baseline_results, experiment_results):
                 identical = stats["identical"]
                 pct = identical / total * 100 if total > 0 else 0
                 print(f"    {prompt_id}: {identical}/{total} identical ({pct:.1f}%)")
+                if stats.get("golden"):
+                    for line in golden_summary(stats["golden"]):
+                        print(f"      {line}")
     else:
         print("\nEXPERIMENT: No data")
 
     print("\n" + "=" * 60)
 
 
+def print_distance_summary(distance_results, excluded=0):
+    """Print mean token edit distances between conditions."""
+    print("\nTOKEN EDIT DISTANCE (mean / max):")
+    if excluded:
+        print(f"  ({excluded} early-stopped runs excluded)")
+    for prompt_id, summary in sorted(distance_results.items()):
+        print(f"\n  Prompt: {prompt_id}")
+        for (a, b), d in sorted(summary.items()):
+            if a <= b:
+                print(f"    {a} vs {b}: {d['mean']:.1f} / {d['max']}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Analyze experiment data")
     parser.add_argument("--config", type=str, default=None, help="Path to config YAML")
+    parser.add_argument(
+        "--distances", action="store_true",
+        help="Compute token edit distances between conditions",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Processes for edit distance computation (default: CPU count)",
+    )
+    parser.add_argument(
+        "--max-distance", type=int, default=None,
+        help="Cap edit distances at this value to speed up very different outputs",
+    )
+    parser.add_argument("--prompt-id", type=str, default=None, help="Analyze only this prompt")
+    parser.add_argument(
+        "--condition", type=str, default=None,
+        help="Analyze only this condition ('baseline' for baseline data)",
+    )
+    parser.add_argument(
+        "--reindex", action="store_true",
+        help="Add unindexed run files to the data directory indexes first",
+    )
+    parser.add_argument(
+        "--sweep", action="store_true",
+        help="Summarize sweep runs per parameter point instead",
+    )
+    parser.add_argument(
+        "--where", action="append", default=[], metavar="PARAM=VALUE",
+        help="With --sweep, keep only points with this parameter value (repeatable)",
+    )
+    parser.add_argument(
+        "--trace", type=str, default=None, metavar="TRACE",
+        help="Print a per-stage breakdown of a --profile trace file and exit",
+    )
+    tracing.add_arguments(parser)
     args = parser.parse_args()
 
+    if args.trace:
+        tracing.print_trace_summary(args.trace)
+        return
+
     log = setup_logging()
+    tracing.enable_from_args(args, "analyze")
+
+    if args.reindex:
+        for directory in (BASELINE_DIR, RUNS_DIR, SWEEP_DIR):
+            added = update_index(directory)
+            log.info("Indexed %d new run files in %s", added, directory)
+
+    filters = {"prompt_id": args.prompt_id, "condition": args.condition}
+
+    if args.sweep:
+        try:
+            where = parse_where(args.where)
+        except ValueError as e:
+            log.error("%s", e)
+            sys.exit(1)
+        sweep_results = analyze_sweep(log, filters, where)
+        if not sweep_results:
+            log.error("No sweep data found. Run sweep.py first.")
+            sys.exit(1)
+        print_sweep_summary(sweep_results)
+        return
 
-    baseline_results = analyze_baseline(log)
-    experiment_results = analyze_experiment(log)
+    baseline_results = analyze_baseline(log, filters)
+    experiment_results = analyze_experiment(log, filters)
 
     if not baseline_results and not experiment_results:
         log.error("No data found. Run baseline.py or experiment.py first.")
         sys.exit(1)
 
-    plot_identical_rates(baseline_results, experiment_results)
-    plot_divergence_distribution(baseline_results, experiment_results)
-    write_results(baseline_results, experiment_results)
+    distance_results = None
+    distance_excluded = 0
+    if args.distances:
+        distance_results, distance_excluded = analyze_distances(
+            log, filters, args.workers, args.max_distance,
+        )
+
+    # A filtered subset must not overwrite the full-dataset results and plots
+    filtered = any(v is not None for v in filters.values())
+    if not filtered:
+        plot_identical_rates(baseline_results, experiment_results)
+        plot_divergence_distribution(baseline_results, experiment_results)
+        if distance_results:
+            plot_distance_heatmaps(distance_results)
+        write_results(baseline_results, experiment_results, distance_results, distance_excluded)
     print_summary(baseline_results, experiment_results)
+    if distance_results:
+        print_distance_summary(distance_results, distance_excluded)
 
-    print(f"\nResults written to {RESULTS_PATH}")
-    print(f"Plots saved to {PLOTS_DIR}/")
+    if filtered:
+        print("\nFiltered analysis: RESULTS.md and plots were not updated.")
+    else:
+        print(f"\nResults written to {RESULTS_PATH}")
+        print(f"Plots saved to {PLOTS_DIR}/")
 
 
 if __name__ == "__main__":
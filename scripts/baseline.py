@@ -1,15 +1,28 @@
 """Run baseline characterization: N identical inferences to establish the mechanical noise floor."""
 
 import argparse
+import codecs
+import itertools
 import json
+import locale
+import re
 import subprocess
 import sys
+import tempfile
+import threading
 from pathlib import Path
 
+import tracing
+from golden import load_golden, register_golden
+from sequential import adaptive_stop
 from utils import (
     compare_outputs,
+    compare_to_golden,
+    first_divergence,
+    inference_params,
     load_config,
     make_run_filename,
+    params_hash,
     resolve_model_path,
     save_run,
     setup_logging,
@@ -18,13 +31,15 @@ from utils import (
 
 DATA_DIR = Path(__file__).parent.parent / "data" / "baseline"
 
+INFERENCE_TIMEOUT = 120
 
-def run_inference(config, prompt_text, seed=None):
-    """Run a single inference via llama-completion and return the output text."""
+
+def build_inference_cmd(config, prompt_text, seed=None):
+    """Build the llama-completion command line for a single inference."""
     model_path = resolve_model_path(config)
     inf = config["inference"]
 
-    cmd = [
+    return [
         inf["llama_cli_path"],
         "-m", model_path,
         "-p", prompt_text,
@@ -37,11 +52,17 @@ def run_inference(config, prompt_text, seed=None):
         "--no-perf",
     ]
 
+
+@tracing.traced
+def run_inference(config, prompt_text, seed=None):
+    """Run a single inference via llama-completion and return the output text."""
+    cmd = build_inference_cmd(config, prompt_text, seed)
+
     result = subprocess.run(
         cmd,
         capture_output=True,
         text=True,
-        timeout=120,
+        timeout=INFERENCE_TIMEOUT,
     )
 
     if result.returncode != 0:
@@ -52,11 +73,108 @@ def run_inference(config, prompt_text, seed=None):
     return result.stdout
 
 
-def run_baseline(config, prompt, n_runs, log):
-    """Run N inferences for a single prompt and save results."""
+@tracing.traced
+def run_inference_early_stop(config, prompt_text, golden, seed=None):
+    """Stream an inference against a golden reference, aborting on divergence.
+
+    Tokens are whitespace-delimited words, as in compare_outputs. Generation
+    is killed once `early_stop.stop_after` tokens have been produced past the
+    first divergent token, and the saved output is cut at the end of the last
+    kept token so it depends only on the generated tokens, not on how the
+    pipe was read. Returns (output, record) where record holds the golden
+    key, the first divergence token (None if identical), whether the run was
+    cut short and, if so, how many tokens were kept.
+    """
+    cmd = build_inference_cmd(config, prompt_text, seed)
+    stop_after = config["early_stop"]["stop_after"]
+    ref_tokens = golden["tokens"]
+    decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))()
+
+    chunks = []
+    n_tokens = 0
+    pending = ""
+    divergence = None
+    stopped = False
+
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        timer = threading.Timer(INFERENCE_TIMEOUT, proc.kill)
+        timer.start()
+        try:
+            while not stopped:
+                data = proc.stdout.read1(4096)
+                final = not data
+                text = decoder.decode(data, final=final)
+                chunks.append(text)
+
+                words = (pending + text).split()
+                pending = ""
+                if not final and words and not text[-1:].isspace():
+                    # Last word may continue in the next chunk
+                    pending = words.pop()
+
+                for word in words:
+                    if divergence is None and (
+                        n_tokens >= len(ref_tokens) or word != ref_tokens[n_tokens]
+                    ):
+                        divergence = n_tokens
+                    n_tokens += 1
+                    if divergence is not None and n_tokens > divergence + stop_after:
+                        stopped = True
+                        break
+
+                if final:
+                    break
+
+            if stopped:
+                proc.kill()
+            proc.wait()
+        finally:
+            timer.cancel()
+            proc.stdout.close()
+
+        if not stopped and proc.returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(
+                f"llama-completion failed (exit {proc.returncode}):\n"
+                f"{stderr.read().decode(errors='replace')}"
+            )
+
+    output = "".join(chunks)
+    if stopped:
+        # Drop whatever the pipe delivered past the last kept token
+        last = list(itertools.islice(re.finditer(r"\S+", output), n_tokens))[-1]
+        output = output[:last.end()]
+    else:
+        # Settle the divergence point exactly as compare_outputs would
+        if output == golden["output"]:
+            divergence = None
+        else:
+            divergence = first_divergence(ref_tokens, output.split())
+
+    return output, {
+        "golden": golden["params_hash"],
+        "first_divergence_token": divergence,
+        "stopped_early": stopped,
+        "stop_after": stop_after,
+        "cut_tokens": n_tokens if stopped else None,
+    }
+
+
+def run_baseline(config, prompt, n_runs, log, early_stop=False, adaptive=None):
+    """Run N inferences for a single prompt and save results.
+
+    With early_stop, runs are streamed against the golden reference for this
+    parameter set (registering the first full run as golden if none exists).
+    With adaptive settings, N is an upper bound and the batch stops as soon as
+    the identical rate is known precisely enough (see sequential.py).
+    """
     prompt_id = prompt["id"]
     prompt_text = prompt["text"]
     seed = config["inference"]["seed"]
+    params = inference_params(config, prompt_text)
+    key = params_hash(params)
+    golden = load_golden(key) if early_stop else None
     runs = []
 
     log.info("Prompt '%s': running %d inferences", prompt_id, n_runs)
@@ -65,7 +183,11 @@ def run_baseline(config, prompt, n_runs, log):
         ts = timestamp_now()
         log.info("  Run %d/%d", i + 1, n_runs)
 
-        output = run_inference(config, prompt_text)
+        early_stop_record = None
+        if golden:
+            output, early_stop_record = run_inference_early_stop(config, prompt_text, golden)
+        else:
+            output = run_inference(config, prompt_text)
 
         filename = make_run_filename("baseline", seed, i, ts, prompt_id=prompt_id)
         run_data = {
@@ -82,15 +204,40 @@ def run_baseline(config, prompt, n_runs, log):
                 "max_tokens": config["inference"]["max_tokens"],
                 "n_gpu_layers": config["inference"]["n_gpu_layers"],
             },
+            "params_hash": key,
         }
+        if early_stop_record:
+            run_data["early_stop"] = early_stop_record
 
         save_run(run_data, DATA_DIR)
         runs.append(run_data)
 
+        if early_stop and golden is None:
+            golden = register_golden(run_data, key, params)
+            log.info("  Registered run %d as golden reference %s", i, key[:12])
+
+        if adaptive and adaptive_stop(runs, adaptive, log):
+            break
+
     return runs
 
 
-def print_summary(prompt_id, stats):
+def print_golden_summary(golden_stats):
+    """Print how early-stop runs compared with the golden reference."""
+    total = golden_stats["total"]
+    identical = golden_stats["identical"]
+    divergent = golden_stats["divergent"]
+
+    print(f"{identical} of {total} early-stop runs matched the golden reference.")
+    if divergent:
+        tokens = [d["first_divergence_token"] for d in divergent]
+        print(
+            f"Divergence from golden at token {min(tokens)}-{max(tokens)} "
+            f"(avg {sum(tokens) / len(tokens):.1f}) in {len(divergent)} runs."
+        )
+
+
+def print_summary(prompt_id, stats, golden_stats=None):
     """Print a human-readable summary of the comparison."""
     total = stats["total"]
     identical = stats["identical"]
@@ -109,17 +256,31 @@ def print_summary(prompt_id, stats):
             f"(avg {avg_t:.1f}) in {len(divergent)} runs."
         )
 
+    if golden_stats:
+        print_golden_summary(golden_stats)
+
 
 def main():
     parser = argparse.ArgumentParser(description="Run baseline characterization")
     parser.add_argument("--config", type=str, default=None, help="Path to config YAML")
     parser.add_argument("--n-runs", type=int, default=None, help="Override number of runs")
     parser.add_argument("--prompt-id", type=str, default=None, help="Run only this prompt")
+    parser.add_argument(
+        "--early-stop", action="store_true",
+        help="Stream against the golden reference and stop soon after divergence",
+    )
+    parser.add_argument(
+        "--adaptive", action="store_true",
+        help="Stop each prompt once its identical rate is estimated precisely (--n-runs caps it)",
+    )
+    tracing.add_arguments(parser)
     args = parser.parse_args()
 
     log = setup_logging()
+    tracing.enable_from_args(args, "baseline")
     config = load_config(args.config)
-    n_runs = args.n_runs or config["baseline"]["n_runs"]
+    adaptive = config["adaptive"] if args.adaptive else None
+    n_runs = args.n_runs or (adaptive["max_runs"] if adaptive else config["baseline"]["n_runs"])
 
     prompts = config["prompts"]
     if args.prompt_id:
@@ -129,9 +290,12 @@ def main():
             sys.exit(1)
 
     for prompt in prompts:
-        runs = run_baseline(config, prompt, n_runs, log)
+        runs = run_baseline(
+            config, prompt, n_runs, log,
+            early_stop=args.early_stop, adaptive=adaptive,
+        )
         stats = compare_outputs(runs)
-        print_summary(prompt["id"], stats)
+        print_summary(prompt["id"], stats, compare_to_golden(runs))
 
     print("\nBaseline complete. Results saved to", DATA_DIR)
 
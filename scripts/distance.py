@@ -0,0 +1,182 @@
+"""Token-level edit distances between run outputs.
+
+Outputs are tokenized into whitespace-delimited words, as in compare_outputs.
+Distances are computed once per distinct pair of outputs (outputs are
+deduplicated by hash first), using a bit-parallel Levenshtein (Myers/Hyyrö)
+on Python integers after stripping the shared prefix and suffix. Large
+batches of pairs are spread over a process pool.
+"""
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Below this many pairs a process pool costs more than it saves
+POOL_MIN_PAIRS = 2000
+
+
+def levenshtein(a, b, max_dist=None):
+    """Return the edit distance between two token sequences.
+
+    If max_dist is given, computation stops as soon as the distance is known
+    to exceed it and max_dist + 1 is returned.
+    """
+    # Shared prefix and suffix never contribute to the distance
+    start = 0
+    end_a, end_b = len(a), len(b)
+    while start < end_a and start < end_b and a[start] == b[start]:
+        start += 1
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a = a[start:end_a]
+    b = b[start:end_b]
+
+    if len(a) > len(b):
+        a, b = b, a
+    m, n = len(a), len(b)
+    if max_dist is not None and n - m > max_dist:
+        return max_dist + 1
+    if m == 0:
+        return n
+
+    # Pattern bitmasks: bit i of peq[token] is set where a[i] == token
+    peq = {}
+    for i, token in enumerate(a):
+        peq[token] = peq.get(token, 0) | (1 << i)
+
+    full = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv = full
+    mv = 0
+    score = m
+
+    for j, token in enumerate(b):
+        eq = peq.get(token, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+        # Each remaining token can lower the score by at most one
+        if max_dist is not None and score - (n - j - 1) > max_dist:
+            return max_dist + 1
+
+    return score
+
+
+_worker_tokens = None
+_worker_max_dist = None
+
+
+def _init_worker(tokens, max_dist):
+    global _worker_tokens, _worker_max_dist
+    _worker_tokens = tokens
+    _worker_max_dist = max_dist
+
+
+def _distance_chunk(pairs):
+    return [
+        levenshtein(_worker_tokens[i], _worker_tokens[j], _worker_max_dist)
+        for i, j in pairs
+    ]
+
+
+def distinct_outputs(outputs):
+    """Deduplicate outputs by hash.
+
+    Returns (distinct, labels) where distinct is the list of unique outputs
+    and labels[k] is the index into distinct of outputs[k].
+    """
+    index = {}
+    distinct = []
+    labels = []
+    for output in outputs:
+        key = hashlib.sha256(output.encode("utf-8")).digest()
+        if key not in index:
+            index[key] = len(distinct)
+            distinct.append(output)
+        labels.append(index[key])
+    return distinct, labels
+
+
+def distance_matrix(distinct, workers=None, max_dist=None):
+    """Return the symmetric token edit distance matrix over distinct outputs.
+
+    With max_dist, distances above it are capped at max_dist + 1.
+    """
+    tokens = [output.split() for output in distinct]
+    n = len(tokens)
+    pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(pairs) < POOL_MIN_PAIRS:
+        _init_worker(tokens, max_dist)
+        distances = _distance_chunk(pairs)
+    else:
+        chunk_size = max(1, len(pairs) // (workers * 4))
+        chunks = [pairs[k:k + chunk_size] for k in range(0, len(pairs), chunk_size)]
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(tokens, max_dist),
+        ) as pool:
+            distances = [d for chunk in pool.map(_distance_chunk, chunks) for d in chunk]
+
+    matrix = [[0] * n for _ in range(n)]
+    for (i, j), d in zip(pairs, distances):
+        matrix[i][j] = d
+        matrix[j][i] = d
+    return matrix
+
+
+def condition_distances(outputs_by_condition, workers=None, max_dist=None):
+    """Summarize token edit distances between and within conditions.
+
+    Takes {condition: [output, ...]} for a single prompt. Returns
+    {(cond_a, cond_b): {"mean": float, "max": int, "pairs": int}} for every
+    ordered pair of conditions. Within a condition, runs are compared against
+    every other run of that condition (self-pairs excluded). max_dist caps
+    individual distances as in distance_matrix.
+    """
+    conditions = sorted(outputs_by_condition)
+    all_outputs = [o for c in conditions for o in outputs_by_condition[c]]
+    distinct, labels = distinct_outputs(all_outputs)
+    matrix = distance_matrix(distinct, workers, max_dist)
+
+    # Multiplicity of each distinct output per condition
+    counts = {}
+    offset = 0
+    for cond in conditions:
+        n = len(outputs_by_condition[cond])
+        cond_counts = {}
+        for label in labels[offset:offset + n]:
+            cond_counts[label] = cond_counts.get(label, 0) + 1
+        counts[cond] = cond_counts
+        offset += n
+
+    summary = {}
+    for a in conditions:
+        for b in conditions:
+            total = 0
+            largest = 0
+            for u, cu in counts[a].items():
+                for v, cv in counts[b].items():
+                    d = matrix[u][v]
+                    total += cu * cv * d
+                    if d > largest:
+                        largest = d
+            n_a = len(outputs_by_condition[a])
+            n_b = len(outputs_by_condition[b])
+            pairs = n_a * (n_a - 1) if a == b else n_a * n_b
+            summary[(a, b)] = {
+                "mean": total / pairs if pairs else 0.0,
+                "max": largest,
+                "pairs": pairs,
+            }
+    return summary
@@ -4,18 +4,24 @@ import argparse
 import sys
 from pathlib import Path
 
+import tracing
+from golden import load_golden, register_golden
+from sequential import adaptive_stop
 from utils import (
     compare_outputs,
+    compare_to_golden,
+    inference_params,
     load_config,
     make_run_filename,
+    params_hash,
     resolve_model_path,
     save_run,
     setup_logging,
     timestamp_now,
 )
 
-# Reuse the inference function from baseline
-from baseline import run_inference
+# Reuse the inference functions from baseline
+from baseline import print_golden_summary, run_inference, run_inference_early_stop
 
 DATA_DIR = Path(__file__).parent.parent / "data" / "runs"
 
@@ -55,11 +61,23 @@ def get_operator_info(condition):
     }
 
 
-def run_experiment(config, prompt, condition, operator_info, n_runs, log):
-    """Run N inferences for a single prompt under a given condition."""
+def run_experiment(
+    config, prompt, condition, operator_info, n_runs, log,
+    early_stop=False, adaptive=None,
+):
+    """Run N inferences for a single prompt under a given condition.
+
+    With early_stop, runs are streamed against the golden reference for this
+    parameter set (registering the first full run as golden if none exists).
+    With adaptive settings, N is an upper bound and the batch stops as soon as
+    the identical rate is known precisely enough (see sequential.py).
+    """
     prompt_id = prompt["id"]
     prompt_text = prompt["text"]
     seed = config["inference"]["seed"]
+    params = inference_params(config, prompt_text)
+    key = params_hash(params)
+    golden = load_golden(key) if early_stop else None
     runs = []
 
     log.info(
@@ -71,7 +89,11 @@ def run_experiment(config, prompt, condition, operator_info, n_runs, log):
         ts = timestamp_now()
         log.info("  Run %d/%d", i + 1, n_runs)
 
-        output = run_inference(config, prompt_text)
+        early_stop_record = None
+        if golden:
+            output, early_stop_record = run_inference_early_stop(config, prompt_text, golden)
+        else:
+            output = run_inference(config, prompt_text)
 
         filename = make_run_filename(
             "experiment", seed, i, ts,
@@ -95,11 +117,21 @@ def run_experiment(config, prompt, condition, operator_info, n_runs, log):
             "operator": operator_info["operator"],
             "attention_rating": operator_info["attention_rating"],
             "session_notes": operator_info["session_notes"],
+            "params_hash": key,
         }
+        if early_stop_record:
+            run_data["early_stop"] = early_stop_record
 
         save_run(run_data, DATA_DIR)
         runs.append(run_data)
 
+        if early_stop and golden is None:
+            golden = register_golden(run_data, key, params)
+            log.info("  Registered run %d as golden reference %s", i, key[:12])
+
+        if adaptive and adaptive_stop(runs, adaptive, log):
+            break
+
     return runs
 
 
@@ -112,11 +144,22 @@ def main():
     parser.add_argument("--config", type=str, default=None, help="Path to config YAML")
     parser.add_argument("--n-runs", type=int, default=None, help="Override number of runs")
     parser.add_argument("--prompt-id", type=str, default=None, help="Run only this prompt")
+    parser.add_argument(
+        "--early-stop", action="store_true",
+        help="Stream against the golden reference and stop soon after divergence",
+    )
+    parser.add_argument(
+        "--adaptive", action="store_true",
+        help="Stop each prompt once its identical rate is estimated precisely (--n-runs caps it)",
+    )
+    tracing.add_arguments(parser)
     args = parser.parse_args()
 
     log = setup_logging()
+    tracing.enable_from_args(args, "experiment")
     config = load_config(args.config)
-    n_runs = args.n_runs or config["experiment"]["n_runs"]
+    adaptive = config["adaptive"] if args.adaptive else None
+    n_runs = args.n_runs or (adaptive["max_runs"] if adaptive else config["experiment"]["n_runs"])
 
     prompts = config["prompts"]
     if args.prompt_id:
@@ -128,13 +171,19 @@ def main():
     operator_info = get_operator_info(args.condition)
 
     for prompt in prompts:
-        runs = run_experiment(config, prompt, args.condition, operator_info, n_runs, log)
+        runs = run_experiment(
+            config, prompt, args.condition, operator_info, n_runs, log,
+            early_stop=args.early_stop, adaptive=adaptive,
+        )
         stats = compare_outputs(runs)
 
         total = stats["total"]
         identical = stats["identical"]
         print(f"\n--- {args.condition} / {prompt['id']} ---")
         print(f"{identical} of {total} runs produced identical output.")
+        golden_stats = compare_to_golden(runs)
+        if golden_stats:
+            print_golden_summary(golden_stats)
 
     print("\nExperiment complete. Results saved to", DATA_DIR)
 
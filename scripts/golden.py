@@ -0,0 +1,49 @@
+"""Golden reference registry: one known-good output per parameter set.
+
+A golden reference is keyed by the params_hash of the inference parameters
+(model, prompt, seed, temperature, max_tokens, n_gpu_layers). Early-stop
+inference streams new outputs against it and aborts once they diverge.
+
+References are stored as data/golden/<params_hash>.json.
+"""
+
+import json
+import os
+from pathlib import Path
+
+from utils import timestamp_now
+
+GOLDEN_DIR = Path(__file__).parent.parent / "data" / "golden"
+
+
+def load_golden(key, directory=GOLDEN_DIR):
+    """Return the golden reference for a params hash, or None if not registered."""
+    filepath = Path(directory) / f"{key}.json"
+    if not filepath.exists():
+        return None
+    with open(filepath, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def register_golden(run_data, key, params, directory=GOLDEN_DIR):
+    """Register a completed run as the golden reference for `key`.
+
+    An existing reference is never overwritten; it is returned instead.
+    """
+    existing = load_golden(key, directory)
+    if existing is not None:
+        return existing
+
+    golden = {
+        "filename": f"{key}.json",
+        "params_hash": key,
+        "params": params,
+        "output": run_data["output"],
+        "tokens": run_data["output"].split(),
+        "source": run_data["filename"],
+        "registered": timestamp_now(),
+    }
+    os.makedirs(directory, exist_ok=True)
+    with open(Path(directory) / golden["filename"], "w", encoding="utf-8") as f:
+        json.dump(golden, f, indent=2, ensure_ascii=False)
+    return golden
@@ -0,0 +1,112 @@
+"""Sequential (adaptive) stopping for run batches.
+
+After each run the identical-output rate is treated as a Bernoulli proportion
+with a uniform Beta(1, 1) prior. The batch stops once the equal-tailed
+credible interval of the posterior Beta(1 + identical, 1 + divergent) is
+narrower than the target width, subject to min/max run bounds.
+
+Settings come from the `adaptive` section of the config:
+  - min_runs: never stop before this many runs
+  - max_runs: default cap on runs per batch (--n-runs overrides it); the
+    caller's run loop enforces the cap
+  - ci_width: target width of the credible interval (e.g. 0.1 = +/-5 points)
+  - level: credible level (e.g. 0.95)
+"""
+
+import math
+
+
+def _beta_cf(a, b, x):
+    """Continued fraction for the regularized incomplete beta (modified Lentz)."""
+    tiny = 1e-300
+    qab = a + b
+    qap = a + 1.0
+    qam = a - 1.0
+    c = 1.0
+    d = 1.0 - qab * x / qap
+    if abs(d) < tiny:
+        d = tiny
+    d = 1.0 / d
+    h = d
+    for m in range(1, 300):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        if abs(d) < tiny:
+            d = tiny
+        c = 1.0 + aa / c
+        if abs(c) < tiny:
+            c = tiny
+        d = 1.0 / d
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        if abs(d) < tiny:
+            d = tiny
+        c = 1.0 + aa / c
+        if abs(c) < tiny:
+            c = tiny
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 1e-12:
+            break
+    return h
+
+
+def beta_cdf(x, a, b):
+    """Regularized incomplete beta function I_x(a, b)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    log_front = (
+        math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+        + a * math.log(x) + b * math.log1p(-x)
+    )
+    front = math.exp(log_front)
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _beta_cf(a, b, x) / a
+    return 1.0 - front * _beta_cf(b, a, 1.0 - x) / b
+
+
+def beta_ppf(q, a, b):
+    """Inverse of beta_cdf, by bisection."""
+    lo, hi = 0.0, 1.0
+    for _ in range(60):
+        mid = (lo + hi) / 2
+        if beta_cdf(mid, a, b) < q:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def credible_interval(identical, total, level=0.95):
+    """Equal-tailed credible interval for the identical-output rate."""
+    a = 1 + identical
+    b = 1 + total - identical
+    tail = (1 - level) / 2
+    return beta_ppf(tail, a, b), beta_ppf(1 - tail, a, b)
+
+
+def adaptive_stop(runs, settings, log):
+    """Decide whether a batch has measured its identical rate precisely enough.
+
+    Identical means identical to the first run, as in compare_outputs.
+    """
+    total = len(runs)
+    if total < settings["min_runs"]:
+        return False
+
+    reference = runs[0]["output"]
+    identical = sum(1 for run in runs if run["output"] == reference)
+    lo, hi = credible_interval(identical, total, settings["level"])
+    if hi - lo > settings["ci_width"]:
+        return False
+
+    log.info(
+        "  Adaptive stop after %d runs: identical rate %.3f, %.0f%% interval [%.3f, %.3f]",
+        total, identical / total, settings["level"] * 100, lo, hi,
+    )
+    return True
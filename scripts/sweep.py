@@ -0,0 +1,223 @@
+"""Parameter sweep: run a grid of inference parameters, skipping points already run.
+
+The grid comes from the `sweep` section of the config (or --grid FILE with
+the same layout) and maps inference parameters to lists of values:
+
+  sweep:
+    runs_per_point: 5
+    grid:
+      seed: [42, 43]
+      temperature: [0.0, 0.8]
+
+Every combination is run for every prompt. Each parameter point is keyed by
+the params_hash of its inference parameters; points that already have
+runs_per_point runs in data/sweep/ or data/baseline/ are skipped, and
+partially run points are topped up. Operator-condition runs never count, and
+neither do early-stopped runs, whose outputs are truncated.
+
+Results are saved to data/sweep/. Query them with `analyze.py --sweep`.
+"""
+
+import argparse
+import copy
+import itertools
+import sys
+from collections import Counter
+from pathlib import Path
+
+import yaml
+
+import tracing
+from baseline import DATA_DIR as BASELINE_DIR
+from baseline import run_inference
+from utils import (
+    inference_params,
+    load_config,
+    make_run_filename,
+    params_hash,
+    save_run,
+    scan_index,
+    setup_logging,
+    timestamp_now,
+)
+
+DATA_DIR = Path(__file__).parent.parent / "data" / "sweep"
+
+SWEEP_PARAMS = ["seed", "temperature", "n_gpu_layers", "max_tokens"]
+
+
+def expand_grid(grid):
+    """Expand {param: [values]} into a list of {param: value} points."""
+    unknown = set(grid) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError(
+            f"Unknown sweep parameters: {', '.join(sorted(unknown))} "
+            f"(expected some of: {', '.join(SWEEP_PARAMS)})"
+        )
+    keys = [k for k in SWEEP_PARAMS if k in grid]
+    values = [v if isinstance(v, list) else [v] for v in (grid[k] for k in keys)]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def point_config(config, overrides):
+    """Return a copy of config with inference parameters overridden."""
+    config = copy.deepcopy(config)
+    config["inference"].update(overrides)
+    return config
+
+
+def existing_counts(directories):
+    """Count completed full-length runs per params_hash from directory indexes.
+
+    Read-only: unindexed files are scanned in memory, never added to the index
+    (use `analyze.py --reindex` for that).
+    """
+    counts = Counter()
+    for directory in directories:
+        counts.update(
+            entry["params_hash"] for entry in scan_index(directory).values()
+            if entry.get("params_hash") and not entry.get("stopped_early")
+        )
+    return counts
+
+
+def build_plan(config, prompts, points, runs_per_point, done):
+    """Build the run plan: one entry per (prompt, parameter point)."""
+    plan = []
+    for prompt in prompts:
+        for overrides in points:
+            cfg = point_config(config, overrides)
+            key = params_hash(inference_params(cfg, prompt["text"]))
+            plan.append({
+                "prompt": prompt,
+                "overrides": overrides,
+                "config": cfg,
+                "params_hash": key,
+                "done": min(done.get(key, 0), runs_per_point),
+                "n_runs": runs_per_point,
+            })
+    return plan
+
+
+def run_point(entry, log):
+    """Run the missing runs of one plan entry and save results."""
+    cfg = entry["config"]
+    prompt = entry["prompt"]
+    key = entry["params_hash"]
+    inf = cfg["inference"]
+
+    for i in range(entry["done"], entry["n_runs"]):
+        ts = timestamp_now()
+        log.info("  Run %d/%d", i + 1, entry["n_runs"])
+
+        output = run_inference(cfg, prompt["text"])
+
+        filename = make_run_filename(
+            f"sweep-{key[:12]}", inf["seed"], i, ts, prompt_id=prompt["id"],
+        )
+        run_data = {
+            "filename": filename,
+            "run_index": i,
+            "seed": inf["seed"],
+            "temperature": inf["temperature"],
+            "prompt_id": prompt["id"],
+            "prompt": prompt["text"],
+            "output": output,
+            "timestamp": ts,
+            "model": cfg["model"]["name"],
+            "params": {
+                "max_tokens": inf["max_tokens"],
+                "n_gpu_layers": inf["n_gpu_layers"],
+            },
+            "params_hash": key,
+            "sweep_point": entry["overrides"],
+        }
+
+        save_run(run_data, DATA_DIR)
+
+
+def describe_point(overrides):
+    return ", ".join(f"{k}={v}" for k, v in overrides.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a parameter sweep")
+    parser.add_argument("--config", type=str, default=None, help="Path to config YAML")
+    parser.add_argument(
+        "--grid", type=str, default=None,
+        help="YAML file with a sweep definition (default: config 'sweep' section)",
+    )
+    parser.add_argument(
+        "--runs-per-point", type=int, default=None,
+        help="Override number of runs per parameter point",
+    )
+    parser.add_argument("--prompt-id", type=str, default=None, help="Run only this prompt")
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Print the run plan without running anything",
+    )
+    tracing.add_arguments(parser)
+    args = parser.parse_args()
+
+    log = setup_logging()
+    tracing.enable_from_args(args, "sweep")
+    config = load_config(args.config)
+
+    if args.grid:
+        with open(args.grid, "r") as f:
+            sweep = yaml.safe_load(f) or {}
+        source = args.grid
+    else:
+        sweep = config.get("sweep") or {}
+        source = "config 'sweep' section"
+    if "grid" not in sweep:
+        log.error("No 'grid' in %s", source)
+        sys.exit(1)
+    runs_per_point = args.runs_per_point or sweep.get("runs_per_point")
+    if not runs_per_point:
+        log.error("No 'runs_per_point' in %s (or pass --runs-per-point)", source)
+        sys.exit(1)
+
+    try:
+        points = expand_grid(sweep["grid"])
+    except ValueError as e:
+        log.error("%s", e)
+        sys.exit(1)
+
+    prompts = config["prompts"]
+    if args.prompt_id:
+        prompts = [p for p in prompts if p["id"] == args.prompt_id]
+        if not prompts:
+            log.error("Prompt ID '%s' not found in config", args.prompt_id)
+            sys.exit(1)
+
+    plan = build_plan(config, prompts, points, runs_per_point, existing_counts([DATA_DIR, BASELINE_DIR]))
+    remaining = sum(e["n_runs"] - e["done"] for e in plan)
+    skipped = sum(1 for e in plan if e["done"] >= e["n_runs"])
+
+    print(f"\nSweep plan: {len(plan)} points, {skipped} already complete, {remaining} runs to do.")
+    for entry in plan:
+        status = "done" if entry["done"] >= entry["n_runs"] else f"{entry['done']}/{entry['n_runs']}"
+        print(
+            f"  [{status:>7}] {entry['prompt']['id']}: {describe_point(entry['overrides'])}"
+            f"  ({entry['params_hash'][:12]})"
+        )
+
+    if args.dry_run:
+        return
+
+    for entry in plan:
+        if entry["done"] >= entry["n_runs"]:
+            continue
+        log.info(
+            "Prompt '%s', %s: running %d inferences",
+            entry["prompt"]["id"], describe_point(entry["overrides"]),
+            entry["n_runs"] - entry["done"],
+        )
+        run_point(entry, log)
+
+    print("\nSweep complete. Results saved to", DATA_DIR)
+
+
+if __name__ == "__main__":
+    main()
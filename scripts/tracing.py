@@ -0,0 +1,200 @@
+"""Opt-in timing spans and profiling for the pipeline.
+
+Enabled per script with --profile [TRACE] or the SHELDRAKE_PROFILE=<trace>
+environment variable. Spans are written as JSON lines, one Chrome trace
+"complete" event per line; wrap the lines in [...] to open the file in
+chrome://tracing or Perfetto. --cprofile PATH (or SHELDRAKE_CPROFILE=<path>)
+dumps cProfile stats for the whole process; it does not write a trace on
+its own.
+
+When profiling is disabled, a traced function costs one extra call and a
+global lookup.
+
+Print a per-stage breakdown of a trace with:
+  python analyze.py --trace data/traces/<file>.jsonl
+"""
+
+import atexit
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+TRACES_DIR = Path(__file__).parent.parent / "data" / "traces"
+
+_enabled = False
+_trace_file = None
+_profiler = None
+_start = None
+_lock = threading.Lock()
+
+
+def add_arguments(parser):
+    """Add the --profile and --cprofile options to an argument parser."""
+    parser.add_argument(
+        "--profile", nargs="?", const="", default=None, metavar="TRACE",
+        help="Write timing spans to TRACE (default: data/traces/<script>_<time>.jsonl)",
+    )
+    parser.add_argument(
+        "--cprofile", type=str, default=None, metavar="PATH",
+        help="Dump cProfile stats to PATH",
+    )
+
+
+def enable_from_args(args, script_name):
+    """Enable profiling from parsed arguments or the environment, if requested."""
+    trace_path = args.profile
+    if trace_path is None:
+        trace_path = os.environ.get("SHELDRAKE_PROFILE")
+    cprofile_path = args.cprofile or os.environ.get("SHELDRAKE_CPROFILE")
+    if trace_path is None and cprofile_path is None:
+        return None
+    if trace_path == "":
+        stamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H-%M-%SZ")
+        trace_path = TRACES_DIR / f"{script_name}_{stamp}.jsonl"
+    return enable(trace_path, cprofile_path)
+
+
+def enable(trace_path=None, cprofile_path=None):
+    """Start writing spans to trace_path and/or run cProfile.
+
+    Either may be None; spans are only recorded when trace_path is given.
+    """
+    global _enabled, _trace_file, _profiler, _start
+    if trace_path is not None and _trace_file is None:
+        os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+        _trace_file = open(trace_path, "w", encoding="utf-8", buffering=1)
+        _start = time.perf_counter()
+        _enabled = True
+        atexit.register(_finish)
+    if cprofile_path and _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+        atexit.register(_dump_cprofile, cprofile_path)
+    return trace_path
+
+
+def _emit(name, start, end):
+    event = {
+        "name": name,
+        "ph": "X",
+        "ts": round((start - _start) * 1e6),
+        "dur": round((end - start) * 1e6),
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+    }
+    with _lock:
+        _trace_file.write(json.dumps(event) + "\n")
+
+
+def _finish():
+    global _enabled, _trace_file
+    if _trace_file is None:
+        return
+    # Whole-process span, used as the denominator in the breakdown
+    _emit("total", _start, time.perf_counter())
+    _enabled = False
+    _trace_file.close()
+    _trace_file = None
+
+
+def _dump_cprofile(path):
+    _profiler.disable()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    _profiler.dump_stats(path)
+
+
+@contextmanager
+def span(name):
+    """Time a block of code as a named span."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _emit(name, start, time.perf_counter())
+
+
+def traced(fn):
+    """Decorator: time each call of fn as a span named after it."""
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _emit(name, start, time.perf_counter())
+
+    return wrapper
+
+
+def summarize_trace(path):
+    """Aggregate a trace file into per-stage totals.
+
+    Returns (total_us, traced_us, stages) where stages maps span name to
+    {"count": int, "total_us": int}. Stage totals are inclusive, so nested
+    spans (read_run_json inside load_runs) are counted in both; traced_us is
+    the wall time covered by any span. total_us is the whole-process wall time
+    (or the end of the last span if the process did not exit cleanly).
+    """
+    stages = defaultdict(lambda: {"count": 0, "total_us": 0})
+    intervals = []
+    total_us = 0
+    end_us = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["name"] == "total":
+                total_us += event["dur"]
+                continue
+            stage = stages[event["name"]]
+            stage["count"] += 1
+            stage["total_us"] += event["dur"]
+            intervals.append((event["ts"], event["ts"] + event["dur"]))
+            end_us = max(end_us, event["ts"] + event["dur"])
+
+    # Union of span intervals, so nested spans are not counted twice
+    traced_us = 0
+    cover_end = None
+    for start, end in sorted(intervals):
+        if cover_end is None or start > cover_end:
+            traced_us += end - start
+            cover_end = end
+        elif end > cover_end:
+            traced_us += end - cover_end
+            cover_end = end
+    return total_us or end_us, traced_us, dict(stages)
+
+
+def print_trace_summary(path):
+    """Print a per-stage breakdown of a trace file."""
+    total_us, traced_us, stages = summarize_trace(path)
+
+    print(f"\nTrace: {path}")
+    print(f"Wall time: {total_us / 1e6:.3f}s\n")
+    print(f"  {'stage':<30} {'calls':>7} {'total s':>10} {'mean ms':>10} {'% wall':>7}")
+    for name, s in sorted(stages.items(), key=lambda kv: -kv[1]["total_us"]):
+        pct = s["total_us"] / total_us * 100 if total_us else 0
+        mean_ms = s["total_us"] / s["count"] / 1e3
+        print(
+            f"  {name:<30} {s['count']:>7} {s['total_us'] / 1e6:>10.3f} "
+            f"{mean_ms:>10.2f} {pct:>6.1f}%"
+        )
+    other_us = max(total_us - traced_us, 0)
+    pct = other_us / total_us * 100 if total_us else 0
+    print(f"  {'(untraced orchestration)':<30} {'':>7} {other_us / 1e6:>10.3f} {'':>10} {pct:>6.1f}%")
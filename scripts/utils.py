@@ -8,6 +8,8 @@ from pathlib import Path
 
 import yaml
 
+from tracing import span, traced
+
 
 def load_config(config_path=None):
     if config_path is None:
@@ -39,8 +41,53 @@ def make_run_filename(prefix, seed, run_index, timestamp, prompt_id=None, condit
     return "_".join(parts) + ".json"
 
 
+def inference_params(config, prompt_text, seed=None):
+    """Collect the parameters that fully determine an inference's output."""
+    inf = config["inference"]
+    return {
+        "model": config["model"]["name"],
+        "prompt": prompt_text,
+        "seed": int(seed if seed is not None else inf["seed"]),
+        "temperature": float(inf["temperature"]),
+        "max_tokens": int(inf["max_tokens"]),
+        "n_gpu_layers": int(inf["n_gpu_layers"]),
+    }
+
+
+def params_hash(params):
+    """Return a canonical SHA-256 hex digest of a parameter dict.
+
+    Keys are sorted so the hash does not depend on insertion order.
+    """
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+INDEX_FILENAME = "index.jsonl"
+
+
+def _index_entry(data):
+    return {
+        "filename": data["filename"],
+        "prompt_id": data.get("prompt_id"),
+        "condition": data.get("condition"),
+        "seed": data.get("seed"),
+        "run_index": data.get("run_index"),
+        "timestamp": data.get("timestamp"),
+        "params_hash": data.get("params_hash"),
+        "stopped_early": data.get("early_stop", {}).get("stopped_early", False),
+    }
+
+
+def _append_index(entries, directory):
+    with open(os.path.join(directory, INDEX_FILENAME), "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+@traced
 def save_run(data, directory):
-    """Save a run's data as JSON."""
+    """Save a run's data as JSON and record it in the directory index."""
     os.makedirs(directory, exist_ok=True)
     filename = data.get("filename")
     if not filename:
@@ -48,21 +95,155 @@ def save_run(data, directory):
     filepath = os.path.join(directory, filename)
     with open(filepath, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
+    _append_index([_index_entry(data)], directory)
     return filepath
 
 
-def load_runs(directory):
-    """Load all JSON run files from a directory."""
-    runs = []
+def read_index(directory):
+    """Read a directory's run index. Returns {filename: entry}; later entries win."""
+    index = {}
+    index_path = Path(directory) / INDEX_FILENAME
+    if not index_path.exists():
+        return index
+    with open(index_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                index[entry["filename"]] = entry
+    return index
+
+
+def _unindexed_entries(directory, index):
+    entries = []
+    for filepath in sorted(Path(directory).glob("*.json")):
+        if filepath.name in index:
+            continue
+        with open(filepath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        data["filename"] = filepath.name
+        entries.append(_index_entry(data))
+    return entries
+
+
+def update_index(directory):
+    """Index run files that are not yet in the directory index. Returns the count added."""
+    directory = Path(directory)
+    if not directory.exists():
+        return 0
+    entries = _unindexed_entries(directory, read_index(directory))
+    if entries:
+        _append_index(entries, directory)
+    return len(entries)
+
+
+def scan_index(directory):
+    """Return {filename: entry} for every run file currently in a directory.
+
+    Indexed files come from the index; unindexed files are read and indexed in
+    memory only. Nothing is written, and entries for deleted files are dropped.
+    """
+    directory = Path(directory)
+    if not directory.exists():
+        return {}
+    index = read_index(directory)
+    present = {p.name for p in directory.glob("*.json")}
+    scanned = {name: entry for name, entry in index.items() if name in present}
+    for entry in _unindexed_entries(directory, index):
+        scanned[entry["filename"]] = entry
+    return scanned
+
+
+def _normalize_timestamp(ts):
+    # Filenames store timestamps with ':' replaced by '-'
+    return ts.replace(":", "-").replace(" ", "_")
+
+
+def _filename_may_match(name, prompt_id, condition, seed, since, until):
+    """Check filters against a make_run_filename name, without opening the file.
+
+    Names are <condition|prefix>[_<prompt_id>]_<seed>_<run_index>_<timestamp>.
+    Condition and prompt ids may contain underscores, so those are checked as
+    prefix/suffix of the leading part; the record itself is re-checked after
+    loading.
+    """
+    parts = name[:-len(".json")].rsplit("_", 3)
+    if len(parts) != 4:
+        return True
+    head, file_seed, _, ts = parts
+    if seed is not None and file_seed != str(seed):
+        return False
+    if since is not None and ts < _normalize_timestamp(since):
+        return False
+    if until is not None and ts >= _normalize_timestamp(until):
+        return False
+    if condition is not None and not head.startswith(condition + "_"):
+        return False
+    if prompt_id is not None and not head.endswith("_" + prompt_id):
+        return False
+    return True
+
+
+def _record_matches(data, prompt_id, condition, seed, since, until):
+    if prompt_id is not None and data.get("prompt_id") != prompt_id:
+        return False
+    if condition is not None and data.get("condition") != condition:
+        return False
+    if seed is not None and data.get("seed") != seed:
+        return False
+    ts = data.get("timestamp")
+    if since is not None and (ts is None or _normalize_timestamp(ts) < _normalize_timestamp(since)):
+        return False
+    if until is not None and (ts is None or _normalize_timestamp(ts) >= _normalize_timestamp(until)):
+        return False
+    return True
+
+
+def iter_runs(directory, prompt_id=None, condition=None, seed=None, since=None, until=None):
+    """Yield JSON run records from a directory, skipping files that fail the filters.
+
+    Filters are checked against the directory index, or the filename when a
+    file is not indexed, before the file is opened. `since` is inclusive and
+    `until` exclusive; both are ISO timestamps or dates.
+    """
     directory = Path(directory)
     if not directory.exists():
-        return runs
+        return
+    index = read_index(directory)
+    filters = (prompt_id, condition, seed, since, until)
     for filepath in sorted(directory.glob("*.json")):
-        with open(filepath, "r", encoding="utf-8") as f:
-            runs.append(json.load(f))
-    return runs
+        entry = index.get(filepath.name)
+        if entry is not None:
+            if not _record_matches(entry, *filters):
+                continue
+        elif not _filename_may_match(filepath.name, *filters):
+            continue
+        with span("read_run_json"):
+            with open(filepath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        if _record_matches(data, *filters):
+            yield data
+
 
+@traced
+def load_runs(directory, **filters):
+    """Load all JSON run files from a directory matching the iter_runs filters."""
+    return list(iter_runs(directory, **filters))
 
+
+def first_divergence(ref_tokens, tokens):
+    """Return the index of the first token where two token lists differ.
+
+    If one list is a prefix of the other, the divergence is at the end of the
+    shorter one.
+    """
+    for i, (a, b) in enumerate(zip(ref_tokens, tokens)):
+        if a != b:
+            return i
+    return min(len(ref_tokens), len(tokens))
+
+
+@traced
 def compare_outputs(runs):
     """Compare outputs across runs. Returns stats about identical/divergent runs.
 
@@ -84,16 +265,7 @@ def compare_outputs(runs):
         if output == reference:
             identical += 1
         else:
-            # Find first divergent token
-            tokens = output.split()
-            first_diff = None
-            for i, (a, b) in enumerate(zip(ref_tokens, tokens)):
-                if a != b:
-                    first_diff = i
-                    break
-            if first_diff is None:
-                # One is a prefix of the other
-                first_diff = min(len(ref_tokens), len(tokens))
+            first_diff = first_divergence(ref_tokens, output.split())
             divergent.append({
                 "run_index": run["run_index"],
                 "first_divergence_token": first_diff,
@@ -106,6 +278,33 @@ def compare_outputs(runs):
     }
 
 
+def compare_to_golden(runs):
+    """Summarize early-stop runs against their golden reference.
+
+    Uses the divergence point recorded during streaming rather than comparing
+    (possibly truncated) outputs with each other. Returns None if no run has an
+    early_stop record, otherwise a dict shaped like compare_outputs' result,
+    counting only the runs that were streamed against the golden reference.
+    """
+    records = [run for run in runs if run.get("early_stop")]
+    if not records:
+        return None
+
+    divergent = [
+        {
+            "run_index": run["run_index"],
+            "first_divergence_token": run["early_stop"]["first_divergence_token"],
+        }
+        for run in records
+        if run["early_stop"]["first_divergence_token"] is not None
+    ]
+    return {
+        "total": len(records),
+        "identical": len(records) - len(divergent),
+        "divergent": divergent,
+    }
+
+
 def bitwise_compare(a, b):
     """Compare two strings byte-by-byte. Returns index of first difference, or -1 if identical."""
     min_len = min(len(a), len(b))
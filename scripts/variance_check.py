@@ -11,7 +11,9 @@ import argparse
 import sys
 from pathlib import Path
 
+import tracing
 from baseline import run_inference, print_summary
+from sequential import adaptive_stop
 from utils import (
     compare_outputs,
     load_config,
@@ -27,13 +29,21 @@ DATA_DIR = Path(__file__).parent.parent / "data" / "variance_check"
 def main():
     parser = argparse.ArgumentParser(description="Variance detection sanity check")
     parser.add_argument("--config", type=str, default=None, help="Path to config YAML")
-    parser.add_argument("--n-runs", type=int, default=10, help="Number of runs (default: 10)")
+    parser.add_argument("--n-runs", type=int, default=None, help="Number of runs (default: 10)")
     parser.add_argument("--temp", type=float, default=0.8, help="Temperature (default: 0.8)")
     parser.add_argument("--prompt-id", type=str, default="light", help="Prompt to use (default: light)")
+    parser.add_argument(
+        "--adaptive", action="store_true",
+        help="Stop once the identical rate is estimated precisely (--n-runs caps it)",
+    )
+    tracing.add_arguments(parser)
     args = parser.parse_args()
 
     log = setup_logging()
+    tracing.enable_from_args(args, "variance_check")
     config = load_config(args.config)
+    adaptive = config["adaptive"] if args.adaptive else None
+    n_runs = args.n_runs or (adaptive["max_runs"] if adaptive else 10)
 
     # Override temperature
     original_temp = config["inference"]["temperature"]
@@ -48,12 +58,12 @@ def main():
     base_seed = config["inference"]["seed"]
     runs = []
 
-    log.info("Variance check: %d runs, temp=%.1f, prompt='%s' (varying seeds)", args.n_runs, args.temp, args.prompt_id)
+    log.info("Variance check: %d runs, temp=%.1f, prompt='%s' (varying seeds)", n_runs, args.temp, args.prompt_id)
 
-    for i in range(args.n_runs):
+    for i in range(n_runs):
         ts = timestamp_now()
         seed = base_seed + i
-        log.info("  Run %d/%d (seed=%d)", i + 1, args.n_runs, seed)
+        log.info("  Run %d/%d (seed=%d)", i + 1, n_runs, seed)
 
         output = run_inference(config, prompt["text"], seed=seed)
 
@@ -77,6 +87,9 @@ def main():
         save_run(run_data, DATA_DIR)
         runs.append(run_data)
 
+        if adaptive and adaptive_stop(runs, adaptive, log):
+            break
+
     stats = compare_outputs(runs)
     print_summary(args.prompt_id, stats)
 